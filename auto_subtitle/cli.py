@@ -1,11 +1,29 @@
 import os
 import ffmpeg
-import whisper
+import numpy as np
 import argparse
 import warnings
 import tempfile
 import random
-from .utils import filename, str2bool
+import subprocess
+import ctranslate2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from .daemon import request_transcription
+from .utils import filename, format_timestamp, str2bool
+
+# Converted CTranslate2 checkpoints are kept here so later runs (and the
+# daemon) reuse them instead of re-downloading/re-converting.
+MODEL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "auto_subtitle")
+
+AVAILABLE_MODELS = [
+    "tiny.en", "tiny", "base.en", "base", "small.en", "small",
+    "medium.en", "medium", "large-v1", "large-v2", "large-v3", "large",
+    "distil-large-v2", "distil-medium.en", "distil-small.en", "distil-large-v3",
+    "large-v3-turbo", "turbo",
+]
+
+LANGUAGES = ("auto","af","am","ar","as","az","ba","be","bg","bn","bo","br","bs","ca","cs","cy","da","de","el","en","es","et","eu","fa","fi","fo","fr","gl","gu","ha","haw","he","hi","hr","ht","hu","hy","id","is","it","ja","jw","ka","kk","km","kn","ko","la","lb","ln","lo","lt","lv","mg","mi","mk","ml","mn","mr","ms","mt","my","ne","nl","nn","no","oc","pa","pl","ps","pt","ro","ru","sa","sd","si","sk","sl","sn","so","sq","sr","su","sv","sw","ta","te","tg","th","tk","tl","tr","tt","uk","ur","uz","vi","yi","yo","zh")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -13,20 +31,30 @@ def main():
     parser.add_argument("video", nargs="+", type=str,
                         help="paths to video files to transcribe")
     parser.add_argument("--model", default="large",
-                        choices=whisper.available_models(), help="name of the Whisper model to use")
+                        choices=AVAILABLE_MODELS, help="name of the Whisper model to use")
+    parser.add_argument("--compute_type", type=str, default="auto",
+                        choices=["auto", "int8", "int8_float16", "float16", "bfloat16", "float32"],
+                        help="precision for the CTranslate2 backend; 'auto' picks float16 on CUDA and int8 on CPU")
+    parser.add_argument("--quantize", dest="compute_type", default=argparse.SUPPRESS,
+                        choices=["none", "int8", "int8_float16", "float16"],
+                        help="alias for --compute_type; 'none' keeps the checkpoint's own precision")
     parser.add_argument("--output_dir", "-o", type=str,
                         default=".", help="directory to save the outputs")
     parser.add_argument("--output_ass", type=str2bool, default=False,
                         help="whether to output the .ass file along with the video files")
     parser.add_argument("--ass_only", type=str2bool, default=False,
                         help="only generate the .ass file and not create overlayed video")
+    parser.add_argument("--format", type=str, default="ass", choices=["ass", "srt"],
+                        help="subtitle format to generate")
+    parser.add_argument("--burn", type=str2bool, default=True,
+                        help="burn the subtitles into the video; if false, mux them as a soft subtitle track into an .mkv without re-encoding")
     parser.add_argument("--verbose", type=str2bool, default=False,
                         help="whether to print out the progress and debug messages")
     parser.add_argument("--delay", type=float, default=0,
                         help="whether to print out the progress and debug messages")
     parser.add_argument("--task", type=str, default="transcribe", choices=[
                         "transcribe", "translate"], help="whether to perform X->X speech recognition ('transcribe') or X->English translation ('translate')")
-    parser.add_argument("--language", type=str, default="auto", choices=["auto","af","am","ar","as","az","ba","be","bg","bn","bo","br","bs","ca","cs","cy","da","de","el","en","es","et","eu","fa","fi","fo","fr","gl","gu","ha","haw","he","hi","hr","ht","hu","hy","id","is","it","ja","jw","ka","kk","km","kn","ko","la","lb","ln","lo","lt","lv","mg","mi","mk","ml","mn","mr","ms","mt","my","ne","nl","nn","no","oc","pa","pl","ps","pt","ro","ru","sa","sd","si","sk","sl","sn","so","sq","sr","su","sv","sw","ta","te","tg","th","tk","tl","tr","tt","uk","ur","uz","vi","yi","yo","zh"], 
+    parser.add_argument("--language", type=str, default="auto", choices=LANGUAGES,
     help="What is the origin language of the video? If unset, it is detected automatically.")
 
     args = parser.parse_args().__dict__
@@ -34,7 +62,10 @@ def main():
     output_dir: str = args.pop("output_dir")
     output_ass: bool = args.pop("output_ass")
     ass_only: bool = args.pop("ass_only")
+    burn: bool = args.pop("burn")
+    fmt: str = args.pop("format")
     language: str = args.pop("language")
+    compute_type: str = args.pop("compute_type")
     delay: float = args.pop("delay")
 
     os.makedirs(output_dir, exist_ok=True)
@@ -46,121 +77,307 @@ def main():
     elif language != "auto":
         args["language"] = language
         
-    model = whisper.load_model(model_name)
+    cpu_threads = tune_cpu_threads()
+    device, default_compute_type = select_device()
+    if compute_type == "auto":
+        compute_type = default_compute_type
+    elif compute_type == "none":
+        # CTranslate2 spelling for "no quantization, keep checkpoint precision".
+        compute_type = "default"
+
+    # Prefer a running auto_subtitle-daemon so the model is loaded only once
+    # across invocations; load in-process (lazily) when no daemon is around.
+    pipeline = None
+
+    def transcribe_audio(path, audio):
+        nonlocal pipeline
+        # The daemon decodes the media file itself, so it only needs the path.
+        result = request_transcription(path, args)
+        if result is not None:
+            return result["segments"]
+
+        if pipeline is None:
+            os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+            pipeline = BatchedInferencePipeline(
+                model=WhisperModel(model_name, device=device, compute_type=compute_type,
+                                   cpu_threads=cpu_threads, download_root=MODEL_CACHE_DIR))
+        return transcribe(pipeline, audio, batch_size=select_batch_size(device), **args)
+
     audios = get_audio(args.pop("video"))
     subtitles = get_subtitles(
-        audios, output_ass or ass_only, output_dir, lambda audio_path: model.transcribe(audio_path, word_timestamps=True, **args), delay
+        audios, output_ass or ass_only, output_dir, transcribe_audio, delay, fmt
     )
 
     if ass_only:
         return
 
-    for path, ass_path in subtitles.items():
-        out_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}.mp4")
-        print(f"Adding TikTok-style subtitles to {os.path.basename(path)}...")
+    # Each ffmpeg encode already multithreads, so keep the pool small.
+    with ProcessPoolExecutor(max_workers=max(1, os.cpu_count() // 4)) as executor:
+        futures = {}
+        for path, ass_path in subtitles.items():
+            if burn:
+                print(f"Adding TikTok-style subtitles to {os.path.basename(path)}...")
+                futures[executor.submit(_burn, path, ass_path, output_dir, device)] = path
+            else:
+                print(f"Muxing subtitles into {os.path.basename(path)}...")
+                futures[executor.submit(_mux, path, ass_path, output_dir)] = path
 
-        video = ffmpeg.input(path)
-        audio = video.audio
+        for future in as_completed(futures):
+            print(f"Saved subtitled video to {os.path.abspath(future.result())}.")
 
-        # Apply subtitles filter with styling for .ass subtitles
-        ffmpeg.concat(
-            video.filter('subtitles', ass_path),
-            audio, v=1, a=1
-        ).output(out_path).run(quiet=True, overwrite_output=True)
+def _escape_filter_path(path):
+    # Filenames go through two parsers: the filter argument value first, then
+    # the filtergraph string. Escape each level's special characters the same
+    # way ffmpeg-python's serialization did (backslash first at both levels).
+    for special in ("\\'=:", "\\'[],;"):
+        path = "".join("\\" + char if char in special else char for char in path)
+    return path
 
-        print(f"Saved subtitled video to {os.path.abspath(out_path)}.")
+def _burn(path, ass_path, output_dir, device="cpu"):
+    out_path = os.path.join(output_dir, f"{filename(path)}.mp4")
 
-def get_audio(paths):
-    temp_dir = tempfile.gettempdir()
-    audio_paths = {}
+    if device == "cuda":
+        encoder = ["-c:v", "h264_nvenc"]
+    else:
+        encoder = ["-c:v", "libx264", "-preset", "veryfast"]
+
+    # Invoke ffmpeg directly: no filtergraph serialization, and the subtitles
+    # filter (single-threaded by default in many builds) gets explicit thread
+    # settings.
+    cmd = [
+        "ffmpeg", "-y", "-i", path,
+        "-filter_complex", f"[0:v]subtitles={_escape_filter_path(ass_path)}[v]",
+        "-map", "[v]", "-map", "0:a",
+        *encoder,
+        "-threads", "0",
+        "-filter_threads", str(os.cpu_count()),
+        out_path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+    return out_path
+
+def _mux(path, ass_path, output_dir):
+    out_path = os.path.join(output_dir, f"{filename(path)}.mkv")
+
+    # Stream-copy video and audio and add the subtitles as a soft track;
+    # this is a pure container rewrite, no re-encode.
+    subtitle_codec = "ass" if ass_path.endswith(".ass") else "srt"
+    ffmpeg.output(
+        ffmpeg.input(path), ffmpeg.input(ass_path), out_path,
+        c="copy", **{"c:s": subtitle_codec}
+    ).run(quiet=True, overwrite_output=True)
+
+    return out_path
 
-    for path in paths:
+def tune_cpu_threads():
+    """Match thread counts to the CPUs this process may actually use, which
+    cgroup limits can make smaller than os.cpu_count(). Must run before the
+    model is loaded so the OpenMP/MKL pools are sized correctly."""
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    os.environ.setdefault("OMP_NUM_THREADS", str(count))
+    os.environ.setdefault("MKL_NUM_THREADS", str(count))
+    os.environ.setdefault("MKL_DYNAMIC", "FALSE")
+    return count
+
+def select_device():
+    """Pick the inference device and its default CTranslate2 compute type,
+    once at startup: float16 on CUDA, int8 on CPU."""
+    device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    return device, "float16" if device == "cuda" else "int8"
+
+# Silence is dropped before decoding: Whisper wastes time on (and tends to
+# hallucinate in) silent regions. The 200ms pad keeps word boundaries intact
+# for the word-level timestamps.
+VAD_PARAMETERS = {
+    "min_silence_duration_ms": 500,
+    "threshold": 0.5,
+    "speech_pad_ms": 200,
+}
+
+def select_batch_size(device):
+    """Size the batched-decode window from free VRAM, roughly one batch slot
+    per 512 MB; falls back to 16, which is safe for ~8 GB cards and CPU."""
+    if device == "cuda":
+        try:
+            import torch
+            free, _ = torch.cuda.mem_get_info()
+            return max(8, min(64, int(free // (512 * 1024 ** 2))))
+        except (ImportError, RuntimeError):
+            pass
+    return 16
+
+def transcribe(pipeline, audio, verbose=False, batch_size=16, **args):
+    segments, info = pipeline.transcribe(
+        audio, word_timestamps=True, batch_size=batch_size, log_progress=verbose,
+        vad_filter=True, vad_parameters=VAD_PARAMETERS, **args)
+
+    # faster-whisper yields segments lazily; adapt each one to the dict shape
+    # the writers consume as it is produced, so downstream subtitle writing
+    # overlaps with decoding instead of waiting for the full transcript.
+    for segment in segments:
+        yield {
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "words": [
+                {"word": word.word, "start": word.start, "end": word.end}
+                for word in (segment.words or [])
+            ],
+        }
+
+def get_audio(paths):
+    def extract(path):
         print(f"Extracting audio from {filename(path)}...")
-        output_path = os.path.join(temp_dir, f"{filename(path)}.wav")
 
-        ffmpeg.input(path).output(
-            output_path,
-            acodec="pcm_s16le", ac=1, ar="16k"
-        ).run(quiet=True, overwrite_output=True)
+        # Decode straight to 16 kHz mono PCM on a pipe; Whisper accepts the
+        # float32 waveform directly, so no wav scratch file is needed.
+        process = ffmpeg.input(path).output(
+            "pipe:", format="s16le", ac=1, ar="16k"
+        ).run_async(pipe_stdout=True, quiet=True)
+        pcm, stderr = process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", pcm, stderr)
+
+        return path, np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
 
-        audio_paths[path] = output_path
+    # Each extraction blocks on an ffmpeg child process, so threads give
+    # near-linear speedup across files despite the GIL.
+    audios = {}
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count())) as executor:
+        for future in as_completed([executor.submit(extract, path) for path in paths]):
+            path, audio = future.result()
+            audios[path] = audio
 
-    return audio_paths
+    return audios
 
-def get_subtitles(audio_paths: list, output_ass: bool, output_dir: str, transcribe: callable, delay: float):
+def get_subtitles(audios: dict, output_ass: bool, output_dir: str, transcribe: callable, delay: float, fmt: str = "ass"):
     subtitles_path = {}
 
-    for path, audio_path in audio_paths.items():
+    for path, audio in audios.items():
         ass_path = output_dir if output_ass else tempfile.gettempdir()
-        ass_path = os.path.join(ass_path, f"{filename(path)}.ass")
-        
+        ass_path = os.path.join(ass_path, f"{filename(path)}.{fmt}")
+
         print(f"Generating subtitles for {filename(path)}... This might take a while.")
         warnings.filterwarnings("ignore")
-        result = transcribe(audio_path)
+        # Binary mode: the writers pre-encode their output, skipping the text
+        # layer's per-write encoding.
+        with open(ass_path, "wb") as file:
+            WRITERS[fmt](transcribe(path, audio), delay, file=file)
         warnings.filterwarnings("default")
 
-        with open(ass_path, "w", encoding="utf-8") as ass:
-            write_word_level_ass(result["segments"], delay, file=ass)
-
         subtitles_path[path] = ass_path
 
     return subtitles_path
 
+# ASS header with two styles: Default for regular text and Highlight for the
+# color animation only (both top-center aligned).
+_ASS_HEADER = """\
+[Script Info]
+Title: Auto-generated Subtitle
+ScriptType: v4.00+
+Collisions: Normal
+PlayDepth: 0
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default, Montserrat, 14, &H00FFFFFF, &H00FFFFFF, &H00000000, &H64000000, 1, 0, 5, 1, 1, 5, 20, 20, 10, 1
+Style: Highlight, Montserrat, 14, &H0000FF00, &H00FFFFFF, &H00000000, &H64000000, 1, 0, 5, 1, 1, 5, 20, 20, 10, 1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+_ASS_HEADER_BYTES = _ASS_HEADER.encode("utf-8")
+
 def write_word_level_ass(segments, delay, file):
-    # Write the ASS header
-    file.write("[Script Info]\n")
-    file.write("Title: Auto-generated Subtitle\n")
-    file.write("ScriptType: v4.00+\n")
-    file.write("Collisions: Normal\n")
-    file.write("PlayDepth: 0\n\n")
-    
-    # Define styles: Default for regular text and Highlight for color animation only
-    file.write("[V4+ Styles]\n")
-    file.write("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n")
-    file.write("Style: Default, Montserrat, 14, &H00FFFFFF, &H00FFFFFF, &H00000000, &H64000000, 1, 0, 5, 1, 1, 5, 20, 20, 10, 1\n")  # Top-center alignment
-    file.write("Style: Highlight, Montserrat, 14, &H0000FF00, &H00FFFFFF, &H00000000, &H64000000, 1, 0, 5, 1, 1, 5, 20, 20, 10, 1\n")  # Top-center alignment
-
-    file.write("\n[Events]\n")
-    file.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+    file.write(_ASS_HEADER_BYTES)
 
-    for segment in segments:
+    # Consume the segment iterator as transcription produces it, emitting each
+    # segment's dialogue lines in one write so file I/O overlaps decoding.
+    for count, segment in enumerate(segments, start=1):
+        lines = []
         words = segment['words']
-        
+
+        # Hoist the per-word dict lookups and formatting out of the grouping
+        # loops: one pass builds flat tables that are only indexed below.
+        upper_words = [word['word'].upper() for word in words]
+        starts = [format_time(word['start'] + delay) for word in words]
+        ends = [format_time(word['end'] + delay) for word in words]
+
         # Group words in chunks of 1-3 words
         i = 0
         while i < len(words):
             # Randomly select a group size between 1 and 3 words
             group_size = random.randint(1, 3)
-            group = words[i:i + group_size]
-            group_text = " ".join(word['word'].upper() for word in group)
 
-            # Generate subtitle entries to animate color for each word within the static group text
-            for j, word in enumerate(group):
+            # One preallocated list per group; sliding the highlight along it
+            # only touches two slots per step.
+            upper = upper_words[i:i + group_size]
+            styled_text = upper[:]
+
+            for j in range(len(upper)):
                 # Apply delay to start and end times
-                start_time = format_time(word['start'] + delay)
-                end_time = format_time(word['end'] + delay)
-
-                # Build subtitle text with the current word in green only
-                styled_text = []
-                for k, w in enumerate(group):
-                    word_upper = w['word'].upper()  # Convert to uppercase
-                    if k == j:
-                        # Apply the Highlight style (color only)
-                        styled_text.append(f"{{\\rHighlight}}{word_upper}{{\\rDefault}}")
-                    else:
-                        # Regular style for other words
-                        styled_text.append(word_upper)
-
-                # Write the ASS dialogue entry for the static group, changing only the highlighted word
-                file.write(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{' '.join(styled_text)}\n")
+                start_time = starts[i + j]
+                end_time = ends[i + j]
+
+                if j:
+                    styled_text[j - 1] = upper[j - 1]
+                styled_text[j] = f"{{\\rHighlight}}{upper[j]}{{\\rDefault}}"
+
+                # Emit the ASS dialogue entry for the static group, changing only the highlighted word
+                lines.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{' '.join(styled_text)}")
 
             i += group_size
 
+        file.write(("\n".join(lines) + "\n").encode("utf-8"))
+        if count % 16 == 0:
+            file.flush()
+
+def write_word_level_srt(segments, delay, file):
+    # Mirrors write_word_level_ass, emitting numbered SRT cues with the
+    # highlighted word in bold instead of ASS style overrides.
+    index = 1
+
+    for count, segment in enumerate(segments, start=1):
+        lines = []
+        words = segment['words']
+
+        upper_words = [word['word'].upper() for word in words]
+        starts = [format_timestamp(word['start'] + delay, always_include_hours=True) for word in words]
+        ends = [format_timestamp(word['end'] + delay, always_include_hours=True) for word in words]
+
+        i = 0
+        while i < len(words):
+            group_size = random.randint(1, 3)
+            upper = upper_words[i:i + group_size]
+            styled_text = upper[:]
+
+            for j in range(len(upper)):
+                if j:
+                    styled_text[j - 1] = upper[j - 1]
+                styled_text[j] = f"<b>{upper[j]}</b>"
+
+                lines.append(
+                    f"{index}\n{starts[i + j]} --> {ends[i + j]}\n{' '.join(styled_text)}\n")
+                index += 1
+
+            i += group_size
+
+        file.write(("\n".join(lines) + "\n").encode("utf-8"))
+        if count % 16 == 0:
+            file.flush()
+
+WRITERS = {"ass": write_word_level_ass, "srt": write_word_level_srt}
+
 def format_time(seconds):
-    hours, remainder = divmod(seconds, 3600)
-    minutes, remainder = divmod(remainder, 60)
-    seconds, milliseconds = divmod(remainder, 1)
-    return f"{int(hours):01d}:{int(minutes):02d}:{int(seconds):02d}.{int(milliseconds*100):02d}"
+    # Convert once to integer milliseconds so the divmod chain stays in
+    # integer arithmetic, avoiding float rounding drift at boundary values.
+    milliseconds = int(seconds * 1000 + 0.5)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}.{milliseconds // 10:02d}"
 
 
 if __name__ == '__main__':
@@ -0,0 +1,108 @@
+import os
+import json
+import socket
+import argparse
+import tempfile
+from dataclasses import dataclass
+
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+SOCKET_PATH = os.path.join(tempfile.gettempdir(), "auto_subtitle-daemon.sock")
+
+
+@dataclass
+class _SubprocessState:
+    model_name: str
+    device: str
+    compute_type: str
+    pipeline: BatchedInferencePipeline = None
+
+
+def request_transcription(audio_path, options):
+    """Send one transcription request to a running daemon.
+
+    Returns the result dict, or None when no daemon is listening so the
+    caller can fall back to loading the model in-process.
+    """
+    request = {"audio_path": os.path.abspath(audio_path), "options": options}
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(SOCKET_PATH)
+            sock.sendall(json.dumps(request).encode("utf-8"))
+            sock.shutdown(socket.SHUT_WR)
+
+            payload = b""
+            while chunk := sock.recv(65536):
+                payload += chunk
+    except OSError:
+        return None
+
+    response = json.loads(payload)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+
+    return response
+
+
+def serve(state: _SubprocessState, socket_path: str = SOCKET_PATH):
+    # Imported lazily to avoid a circular import with the CLI module.
+    from .cli import select_batch_size, transcribe
+
+    batch_size = select_batch_size(state.device)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+        server.listen(1)
+        print(f"auto_subtitle-daemon ready on {socket_path}")
+
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                data = b""
+                while chunk := conn.recv(65536):
+                    data += chunk
+
+                try:
+                    request = json.loads(data)
+                    # transcribe() is a generator; materialize it since the
+                    # response goes over the socket as one JSON payload.
+                    result = {"segments": list(transcribe(
+                        state.pipeline, request["audio_path"],
+                        batch_size=batch_size, **request.get("options", {})))}
+                except Exception as exception:
+                    result = {"error": str(exception)}
+
+                conn.sendall(json.dumps(result).encode("utf-8"))
+
+
+def main():
+    from .cli import AVAILABLE_MODELS, MODEL_CACHE_DIR, select_device, tune_cpu_threads
+
+    parser = argparse.ArgumentParser(
+        description="Keep a Whisper model loaded and serve transcription requests over a Unix socket.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--model", default="large",
+                        choices=AVAILABLE_MODELS, help="name of the Whisper model to use")
+    parser.add_argument("--socket", type=str, default=SOCKET_PATH,
+                        help="path of the Unix socket to listen on")
+    args = parser.parse_args()
+
+    cpu_threads = tune_cpu_threads()
+    device, compute_type = select_device()
+
+    state = _SubprocessState(args.model, device, compute_type)
+    print(f"Loading {args.model} model ({device}, {compute_type})...")
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    state.pipeline = BatchedInferencePipeline(
+        model=WhisperModel(state.model_name, device=state.device, compute_type=state.compute_type,
+                           cpu_threads=cpu_threads, download_root=MODEL_CACHE_DIR))
+
+    serve(state, args.socket)
+
+
+if __name__ == '__main__':
+    main()
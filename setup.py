@@ -7,11 +7,14 @@ setup(
     py_modules=["auto_subtitle"],
     author="Miguel Piedrafita",
     install_requires=[
-        'openai-whisper',
+        'faster-whisper',
     ],
     description="Automatically generate and embed subtitles into your videos",
     entry_points={
-        'console_scripts': ['auto_subtitle=auto_subtitle.cli:main'],
+        'console_scripts': [
+            'auto_subtitle=auto_subtitle.cli:main',
+            'auto_subtitle-daemon=auto_subtitle.daemon:main',
+        ],
     },
     include_package_data=True,
 )